@@ -1,14 +1,18 @@
+import numpy as np
 import pandas as pd
+from numba import njit, prange
 from datetime import datetime, timedelta
 import os
-import pickle
+import hashlib
+import glob
+import re
 from yahooquery import Ticker
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import csv
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import time
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
 import pytz
 
 # ==========================================
@@ -19,183 +23,319 @@ os.makedirs("cache", exist_ok=True)
 os.makedirs("docs", exist_ok=True)
 
 def fetch_tickers_and_sectors_from_csv(cache_file):
-    mapping, industry_map = {}, {}
-    if os.path.exists(cache_file):
-        with open(cache_file, newline='', encoding='utf-8-sig') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                ticker = row.get('Ticker')
-                sector, industry = row.get('Sector'), row.get('Industry')
-                if ticker:
-                    mapping[ticker.strip()] = sector.strip() if sector else "Unknown"
-                    industry_map[ticker.strip()] = industry.strip() if industry else "Unknown"
-    return mapping, industry_map
+    if not os.path.exists(cache_file): return pd.DataFrame(columns=["Ticker", "Sector", "Industry"])
+    # keep_default_na=False: tickers like "NA" or "NULL" are symbols, not missing values.
+    # The pyarrow engine parses the file in C (pyarrow is already needed for the Feather/Parquet caches)
+    df = pd.read_csv(cache_file, encoding='utf-8-sig', usecols=["Ticker", "Sector", "Industry"], dtype=str,
+                     keep_default_na=False, engine="pyarrow")
+    for c in df.columns: df[c] = df[c].str.strip()
+    df = df[df["Ticker"] != ""]
+    return df.replace({"Sector": {"": "Unknown"}, "Industry": {"": "Unknown"}})
+
+def load_ticker_maps(files):
+    # Merged ticker -> sector/industry table, only re-parsed when the file list, the contents of one
+    # of the CSVs (including one going missing) or this script changes. Contents, not mtimes: every
+    # Actions run is a fresh checkout, so all mtimes are the clone time.
+    cache_file = os.path.join("cache", "ticker_maps.parquet")
+    key_file = cache_file + ".key"
+    key = hashlib.sha1()
+    for f in files + [__file__]:
+        key.update(f.encode() + b"\0")
+        if os.path.exists(f):
+            with open(f, "rb") as fh: key.update(hashlib.sha1(fh.read()).digest())
+        else: key.update(b"missing")
+    key = key.hexdigest()
+    cached_key = None
+    if os.path.exists(cache_file) and os.path.exists(key_file):
+        with open(key_file) as f: cached_key = f.read()
+    if cached_key == key:
+        df = pd.read_parquet(cache_file)
+    else:
+        # First file wins for tickers listed in several CSVs (S&P carries the best metadata),
+        # so each ticker is fetched once with its preferred sector
+        df = pd.concat([fetch_tickers_and_sectors_from_csv(f) for f in files]).drop_duplicates("Ticker", keep="first")
+        df.to_parquet(cache_file, index=False)
+        with open(key_file, "w") as f: f.write(key)
+    return dict(zip(df["Ticker"], df["Sector"])), dict(zip(df["Ticker"], df["Industry"]))
+
+def to_close_rows(batch_data):
+    # (symbol, date) rows from Ticker.history -> flat symbol/date/close rows
+    df = batch_data["close"].reset_index()
+    # Yahoo mixes plain dates with a tz-aware timestamp for the live bar; keep plain dates
+    df["date"] = pd.to_datetime(df["date"], utc=True).dt.tz_localize(None).dt.normalize()
+    # float32 is plenty for close-vs-close comparisons and halves the matrix and cache size
+    df["close"] = df["close"].astype(np.float32)
+    return df
+
+def read_price_cache(cache_file):
+    return pd.read_feather(cache_file).set_index("date")
+
+def to_close_matrix(frame):
+    # Struct-of-arrays: (n_tickers, n_bars) closes on one shared date axis, NaN where a ticker has no bar
+    return np.array(frame.to_numpy(dtype=np.float32).T, order="C"), list(frame.columns), frame.index
+
+def fetch_batch(batch, interval, retries=3, **history_kw):
+    # One yahooquery call for up to 50 tickers, retried with exponential backoff on network errors.
+    # None means the batch failed; a batch Yahoo answered without any bars comes back empty.
+    for attempt in range(retries):
+        try:
+            batch_data = Ticker(batch).history(interval=interval, **history_kw)
+            break
+        except Exception:
+            if attempt < retries - 1: time.sleep(2 ** attempt)
+    else: return None
+    # No bars: yahooquery hands back a dict of errors, or an empty frame without the (symbol, date) index
+    if not isinstance(batch_data, pd.DataFrame) or batch_data.empty: return pd.DataFrame()
+    return to_close_rows(batch_data)
+
+def fetch_closes(tickers, interval, **history_kw):
+    # Batches are pure network wait, so run them concurrently.
+    # Returns the closes and the number of batches that failed after their retries.
+    batches = [tickers[i:i + 50] for i in range(0, len(tickers), 50)]
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        results = list(ex.map(lambda b: fetch_batch(b, interval, **history_kw), batches))
+    failed = sum(r is None for r in results)
+    rows = [r for r in results if r is not None and not r.empty]
+    if not rows: return pd.DataFrame(), failed
+    # One concat + pivot for all batches -> dates x tickers frame of closes
+    df = pd.concat(rows, ignore_index=True).drop_duplicates(["symbol", "date"], keep="last")
+    return df.pivot(index="date", columns="symbol", values="close"), failed
+
+PERIODS = {"6mo": pd.DateOffset(months=6), "2y": pd.DateOffset(years=2)}
 
 def load_or_fetch_price_data(tickers, interval, period, cache_key):
     cache_key = cache_key.upper()
-    cache_file = os.path.join("cache", f"price_cache_{cache_key}.pkl")
+    cache_file = os.path.join("cache", f"price_cache_{cache_key}.feather")
     weekday = datetime.utcnow().weekday()
+    cached = read_price_cache(cache_file) if os.path.exists(cache_file) else None
     # If weekend, use cache
-    if weekday >= 5 and os.path.exists(cache_file):
-        with open(cache_file, "rb") as f: return pickle.load(f)
-        
-    all_data = {}
-    for i in range(0, len(tickers), 50):
-        batch = tickers[i:i + 50]
-        try:
-            t = Ticker(batch)
-            batch_data = t.history(interval=interval, period=period)
-            if isinstance(batch_data, pd.DataFrame):
-                for ticker in batch:
-                    if (ticker,) in batch_data.index:
-                        all_data[ticker] = batch_data.xs(ticker, level=0)
-            time.sleep(0.1)
-        except: pass
-        
-    with open(cache_file, "wb") as f: pickle.dump(all_data, f)
-    return all_data
+    if weekday >= 5 and cached is not None: return to_close_matrix(cached)
+    # Re-run within the hour for the same tickers on the same day: nothing new to download
+    key_file = cache_file + ".key"
+    key = hashlib.sha1("\n".join([interval, period, datetime.utcnow().strftime("%Y-%m-%d")] + sorted(tickers)).encode()).hexdigest()
+    if cached is not None and os.path.exists(key_file) and time.time() - os.path.getmtime(cache_file) < 3600:
+        with open(key_file) as f:
+            if f.read() == key: return to_close_matrix(cached)
+    
+    # Incremental update: tickers already cached only re-download from their second-to-last
+    # bar (the last one may have been a live bar). New tickers get the full period, and
+    # Monday runs refetch everything so split/dividend adjustments don't go stale.
+    incremental = cached is not None and len(cached) > 1 and weekday != 0
+    known = set(cached.columns) & set(tickers) if incremental else set()
+    frame, failed = fetch_closes([t for t in tickers if t not in known], interval, period=period)
+    known = [t for t in tickers if t in known]
+    if known:
+        start = cached.index[-2]
+        recent, recent_failed = fetch_closes(known, interval, start=start.strftime("%Y-%m-%d"))
+        failed += recent_failed
+        # Cells a failed batch (or a symbol Yahoo skipped) didn't bring back keep their cached closes,
+        # otherwise concat would blank good bars from start onwards and the DM counts would skip them
+        old = cached.loc[cached.index >= start, known]
+        recent = recent[recent.index >= start].combine_first(old)[known] if not recent.empty else old
+        updated = pd.concat([cached.loc[cached.index < start, known], recent])
+        frame = pd.concat([updated, frame], axis=1) if not frame.empty else updated
+    if frame.empty: return to_close_matrix(frame)
+    
+    frame = frame.sort_index()
+    frame = frame[frame.index >= frame.index[-1] - PERIODS[period]]
+    # Wide Feather file: a date column plus one close column per ticker
+    frame.reset_index().to_feather(cache_file, compression="zstd")
+    # Only a complete fetch may satisfy a re-run; after a partial one the next run must try Yahoo again
+    if not failed:
+        with open(key_file, "w") as f: f.write(key)
+    elif os.path.exists(key_file): os.remove(key_file)
+    return to_close_matrix(frame)
 
 # ==========================================
 # 2. SIGNAL LOGIC
 # ==========================================
 
-def compute_dm_signals(df):
-    close = df["close"].values
+@njit("i8(f4[::1], f4)", cache=True, nogil=True)
+def trailing_count(close, sign):
+    # Bars in a row, ending at the last one, closing above (sign=1) / below (sign=-1) the close 4 bars earlier.
+    # Only the final count is reported and 9/13 need at most 14 comparisons to tell apart.
+    n = 0
+    for i in range(len(close) - 1, len(close) - 15, -1):
+        if (close[i] - close[i - 4]) * sign > 0: n += 1
+        else: break
+    return n
+
+@njit("UniTuple(b1, 4)(f4[::1])", cache=True, nogil=True)
+def compute_dm_signals(close):
     if len(close) < 20: return False, False, False, False
-    TD, TS = [0] * len(close), [0] * len(close)
-    for i in range(4, len(close)):
-        TD[i] = TD[i - 1] + 1 if close[i] > close[i - 4] else 0
-        TS[i] = TS[i - 1] + 1 if close[i] < close[i - 4] else 0
-    def val_reset(arr, idx):
-        for j in range(idx - 1, 0, -1):
-            if arr[j] < arr[j - 1]: return arr[j]
-        return 0
-    TDUp = [TD[i] - val_reset(TD, i) for i in range(len(close))]
-    TDDn = [TS[i] - val_reset(TS, i) for i in range(len(close))]
-    return TDUp[-1] == 9, TDUp[-1] == 13, TDDn[-1] == 9, TDDn[-1] == 13
-
-def compute_wyckoff_signals(df):
-    if len(df) < 35: return False
-    close = df['close']
-    is_breakout = close.iloc[-1] > close.iloc[-31:-1].max()
-    is_trending = (close.diff() > 0).astype(int).iloc[-5:].sum() > 4 
-    return is_breakout and is_trending
+    # TD/TS drop only by resetting to 0, so the old "value at last reset" correction was always 0
+    td, ts = trailing_count(close, np.float32(1)), trailing_count(close, np.float32(-1))
+    return td == 9, td == 13, ts == 9, ts == 13
+
+# Explicit signatures compile eagerly at import (or load from the on-disk cache) instead of on the
+# first call. No fastmath: it would let LLVM assume away the NaN checks on padded rows.
+@njit("b1[:, ::1](f4[:, ::1])", cache=True, parallel=True)
+def scan_dm_signals(closes):
+    # closes: C-contiguous (n_tickers, n_bars), NaN where a ticker has no bar
+    out = np.zeros((closes.shape[0], 4), dtype=np.bool_)
+    for i in prange(closes.shape[0]):
+        row = closes[i]
+        dm9t, dm13t, dm9b, dm13b = compute_dm_signals(row[~np.isnan(row)])
+        out[i, 0], out[i, 1], out[i, 2], out[i, 3] = dm9t, dm13t, dm9b, dm13b
+    return out
+
+def compute_wyckoff_signals(closes):
+    # closes: (n_tickers, 35) of each ticker's own latest bars; rows with gaps had < 35 bars
+    is_breakout = closes[:, -1] > closes[:, -31:-1].max(axis=1)
+    is_trending = (np.diff(closes[:, -6:], axis=1) > 0).all(axis=1)
+    return np.isfinite(closes).all(axis=1) & is_breakout & is_trending
+
+def last_valid_index(closes):
+    # Column of the latest non-NaN close in every row
+    return closes.shape[1] - 1 - np.argmax(~np.isnan(closes[:, ::-1]), axis=1)
+
+def align_to_tickers(mapping, names):
+    # mapping values laid out along the ticker axis of the close matrix
+    return pd.Series(mapping, dtype=object).reindex(names).fillna("Unknown").to_numpy()
+
+def z_to_a(names, rows):
+    # Row positions ordered by ticker, descending (Z-A) -- the default table order
+    return rows[np.argsort(np.asarray(names)[rows])[::-1]]
+
+def count_sectors(sectors):
+    # Hits per sector in one np.unique pass, keyed in first-seen order so ties in the sector tables keep their order
+    uniq, first, counts = np.unique(sectors, return_index=True, return_counts=True)
+    order = np.argsort(first)
+    return dict(zip(uniq[order].tolist(), counts[order].tolist()))
+
+def right_align(closes):
+    # Move each row's NaNs to the front so the last columns hold every ticker's own latest bars
+    order = np.argsort(~np.isnan(closes), axis=1, kind="stable")
+    return np.take_along_axis(closes, order, axis=1)
 
 # ==========================================
 # 3. SCANNERS
 # ==========================================
 
-def scan_timeframe(ticker_map, industry_map, label, interval):
+def to_weekly(closes, dates):
+    # Weekly bars from the daily matrix: each ticker's last close of every Mon-Fri week
+    weeks = dates.to_period("W-FRI")
+    weekly = pd.DataFrame(closes.T, index=dates).groupby(weeks).last()
+    week_dates = pd.Series(dates, index=dates).groupby(weeks).last()
+    # Only closed weeks count: drop the current one unless its last bar is a Friday
+    if dates[-1].weekday() != 4: weekly, week_dates = weekly.iloc[:-1], week_dates.iloc[:-1]
+    return np.array(weekly.to_numpy().T, order="C"), pd.DatetimeIndex(week_dates)
+
+def scan_timeframe(ticker_map, industry_map, price_data, interval):
     results = {"Tops": [], "Bottoms": []}
-    sector_counts = {"Tops": defaultdict(int), "Bottoms": defaultdict(int)}
-    tickers = list(ticker_map.keys())
-    period = '2y' if interval == '1wk' else '6mo'
-    data = load_or_fetch_price_data(tickers, interval, period, label)
-    candle_date = None
+    sector_counts = {"Tops": {}, "Bottoms": {}}
+    closes, names, dates = price_data
+    if not names: return results, sector_counts, "N/A"
     
-    for ticker, df in data.items():
-        try:
-            if df.empty: continue
-            df = df.reset_index()
-            df.columns = [c.lower() for c in df.columns]
-            
-            # --- FIX FOR FALSE WEEKLY SIGNALS ---
-            # If Weekly, we must ensure we aren't reading the current "in-progress" week
-            # unless it is Friday after close (which we approximate here)
-            if interval == '1wk':
-                last_date = pd.to_datetime(df['date'].iloc[-1])
-                # Simple check: if last date is within last 3 days, it might be incomplete.
-                # Ideally, just drop the last row if we are scanning mid-week.
-                # Assuming script runs daily:
-                if len(df) > 1:
-                    df = df.iloc[:-1] # Always look at the last *closed* week
-            
-            if not candle_date:
-                ld = pd.to_datetime(df['date'].iloc[-1]).tz_localize(None)
-                candle_date = ld.strftime("%Y-%m-%d")
-                
-            p = float(df['close'].iloc[-1])
-            dm9t, dm13t, dm9b, dm13b = compute_dm_signals(df)
-            sec, ind = ticker_map.get(ticker, "Unknown"), industry_map.get(ticker, "Unknown")
-            
-            if dm9t or dm13t:
-                results["Tops"].append((ticker, p, "DM13 Top" if dm13t else "DM9 Top", ind))
-                sector_counts["Tops"][sec] += 1
-            if dm9b or dm13b:
-                results["Bottoms"].append((ticker, p, "DM13 Bot" if dm13b else "DM9 Bot", ind))
-                sector_counts["Bottoms"][sec] += 1
-        except: pass
-        
+    # --- FIX FOR FALSE WEEKLY SIGNALS ---
+    # Weekly bars are resampled from the daily cache (no second Yahoo fetch), and we
+    # must ensure we aren't reading the current "in-progress" week.
+    if interval == '1wk':
+        closes, dates = to_weekly(closes, dates)
+        if not len(dates): return results, sector_counts, "N/A"
+    candle_date = dates[-1].strftime("%Y-%m-%d")
+    
+    # One compiled, parallel pass over the whole matrix; only the hits become Python tuples
+    flags = scan_dm_signals(closes)
+    last = closes[np.arange(len(closes)), last_valid_index(closes)]
+    sectors, industries = align_to_tickers(ticker_map, names), align_to_tickers(industry_map, names)
     # Sort Descending (Z-A) by Default as requested
-    results["Tops"].sort(key=lambda x: x[0], reverse=True)
-    results["Bottoms"].sort(key=lambda x: x[0], reverse=True)
+    rows = z_to_a(names, np.flatnonzero(flags.any(axis=1)))
+    for i in rows:
+        ticker, p, ind = names[i], float(last[i]), industries[i]
+        dm9t, dm13t, dm9b, dm13b = flags[i]
         
-    return results, sector_counts, candle_date if candle_date else "N/A"
-
-def scan_wyckoff(ticker_map, industry_map):
-    cache = os.path.join("cache", "price_cache_1D.pkl")
-    if not os.path.exists(cache): return []
-    with open(cache, "rb") as f: data = pickle.load(f)
-    res = []
-    for t, df in data.items():
-        try:
-            df = df.reset_index(); df.columns = [c.lower() for c in df.columns]
-            if compute_wyckoff_signals(df):
-                p = float(df['close'].iloc[-1])
-                pct = ((p - df['close'].iloc[-2]) / df['close'].iloc[-2]) * 100
-                res.append((t, p, ticker_map.get(t, "Unknown"), industry_map.get(t, "Unknown"), pct))
-        except: pass
+        if dm9t or dm13t: results["Tops"].append((ticker, p, "DM13 Top" if dm13t else "DM9 Top", ind))
+        if dm9b or dm13b: results["Bottoms"].append((ticker, p, "DM13 Bot" if dm13b else "DM9 Bot", ind))
+    
+    for side, cols in [("Tops", [0, 1]), ("Bottoms", [2, 3])]:
+        sector_counts[side] = count_sectors(sectors[rows[flags[rows][:, cols].any(axis=1)]])
+    return results, sector_counts, candle_date
+
+def scan_wyckoff(ticker_map, industry_map, price_data=None):
+    if price_data is None:
+        cache = os.path.join("cache", "price_cache_1D.feather")
+        if not os.path.exists(cache): return []
+        price_data = to_close_matrix(read_price_cache(cache))
+    closes, names, _ = price_data
+    if closes.shape[1] < 35: return []
+    tail = right_align(closes)[:, -35:]
+    hits = compute_wyckoff_signals(tail)
+    prev, p = tail[:, -2].astype(np.float64), tail[:, -1].astype(np.float64)
+    pct = ((p - prev) / prev) * 100
+    sectors, industries = align_to_tickers(ticker_map, names), align_to_tickers(industry_map, names)
     # Sort Descending (Z-A) by default
-    return sorted(res, key=lambda x: x[0], reverse=True)
+    return [(names[i], float(p[i]), sectors[i], industries[i], pct[i]) for i in z_to_a(names, np.flatnonzero(hits))]
 
 # ==========================================
 # 4. FEAR & GREED / PLOTS
 # ==========================================
 
+# Shared keep-alive session (with retries) for the direct HTTP calls
+SESSION = requests.Session()
+SESSION.headers.update({"User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) Chrome/120.0.0.0 Safari/537.36"})
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4,
+                                      max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))))
+
+def last_csv_row(path):
+    # Only the tail of the file is read, however long the history grows
+    if not os.path.exists(path): return None
+    with open(path, "rb") as f:
+        f.seek(max(0, os.path.getsize(path) - 256))
+        lines = f.read().decode("utf-8", "ignore").splitlines()
+    return lines[-1].split(",") if lines else None
+
 def get_fear_and_greed():
     try:
         url = "https://production.dataviz.cnn.io/index/fearandgreed/graphdata"
-        h = {"User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) Chrome/120.0.0.0 Safari/537.36"}
-        d = requests.get(url, headers=h, timeout=10).json()
+        d = SESSION.get(url, timeout=10).json()
         fg = d.get("fear_and_greed", {})
         score, prev = round(fg.get("score", 0)), round(fg.get("previous_close", 0))
         
-        # Save History
-        file_exists = os.path.exists("fear_and_greed_history.csv")
-        with open("fear_and_greed_history.csv", "a", newline="") as f:
-            writer = csv.writer(f)
-            if not file_exists: writer.writerow(["Date", "Index", "Previous Close"])
-            writer.writerow([datetime.utcnow().strftime("%Y-%m-%d"), score, prev])
+        # Save History (one write; re-runs on the same day with an unchanged reading add nothing)
+        today = datetime.utcnow().strftime("%Y-%m-%d")
+        row = [today, str(score), str(prev)]
+        if last_csv_row("fear_and_greed_history.csv") != row:
+            file_exists = os.path.exists("fear_and_greed_history.csv")
+            with open("fear_and_greed_history.csv", "a", newline="") as f:
+                writer = csv.writer(f)
+                if not file_exists: writer.writerow(["Date", "Index", "Previous Close"])
+                writer.writerow(row)
             
-        return score, prev, datetime.utcnow().strftime("%Y-%m-%d")
-    except: return "N/A", "N/A", "N/A"
+        return score, prev, today
+    except Exception: return "N/A", "N/A", "N/A"
 
-def plot_fear_greed_history():
-    try:
-        df = pd.read_csv("fear_and_greed_history.csv")
-        df['Date'] = pd.to_datetime(df['Date'])
-        df = df.sort_values('Date').tail(90) # Last 90 days
-        
-        plt.figure(figsize=(10, 5))
-        plt.plot(df['Date'], df['Index'], color='#333', linewidth=2)
-        
-        # FORCE 0-100 SCALE
-        plt.ylim(0, 100)
-        
-        plt.title("Fear & Greed Index (Last 90 Days)")
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-        plt.savefig("docs/fg_trend.png")
-        plt.close()
-    except: pass
+def fear_greed_svg(w=480, h=240):
+    # Inline SVG line chart of the last 90 readings; strokes use currentColor so it follows the theme
+    if not os.path.exists("fear_and_greed_history.csv") or not os.path.getsize("fear_and_greed_history.csv"): return ""
+    # Only the plotted columns, with dates parsed by the reader in the same pass
+    df = pd.read_csv("fear_and_greed_history.csv", usecols=["Date", "Index"], parse_dates=["Date"])
+    df = df.sort_values('Date').tail(90) # Last 90 days
+    if df.empty: return ""
+    
+    left, right, top, bottom = 32, 10, 28, 22
+    pw, ph = w - left - right, h - top - bottom
+    days = (df["Date"] - df["Date"].iloc[0]).dt.days.to_numpy()
+    x = left + days / max(days[-1], 1) * pw
+    # FORCE 0-100 SCALE
+    y = top + (1 - df["Index"].to_numpy(dtype=float).clip(0, 100) / 100) * ph
+    points = " ".join(f"{a:.1f},{b:.1f}" for a, b in zip(x, y))
+    
+    grid = "".join(f'<line x1="{left}" x2="{w - right}" y1="{top + (1 - v / 100) * ph:.1f}" y2="{top + (1 - v / 100) * ph:.1f}" stroke-opacity="0.3"/>'
+                   f'<text x="{left - 6}" y="{top + (1 - v / 100) * ph + 4:.1f}" text-anchor="end" stroke="none">{v}</text>' for v in range(0, 101, 25))
+    first, last = df["Date"].iloc[0].strftime("%b %d"), df["Date"].iloc[-1].strftime("%b %d")
+    return (f'<svg class="fg-chart" viewBox="0 0 {w} {h}" role="img" aria-label="Fear &amp; Greed Index (Last 90 Days)" '
+            f'style="width: 100%; max-width: {w}px; display:block; margin:6px 0 16px 0;" font-family="Arial, sans-serif" font-size="11" fill="currentColor" stroke="currentColor">'
+            f'<text x="{w / 2:.0f}" y="16" text-anchor="middle" font-size="13" stroke="none">Fear &amp; Greed Index (Last 90 Days)</text>{grid}'
+            f'<text x="{left}" y="{h - 6}" stroke="none">{first}</text><text x="{w - right}" y="{h - 6}" text-anchor="end" stroke="none">{last}</text>'
+            f'<polyline points="{points}" fill="none" stroke-width="2" stroke-linejoin="round"/></svg>')
 
 # ==========================================
 # 5. HTML GENERATION
 # ==========================================
 
-def get_shared_style(fg_color):
-    css = """
-    <style>
+# Built once at import; written to docs/ by write_static_assets
+SHARED_CSS = """
         :root {
             --bg-color: #ffffff;
             --text-color: #333333;
@@ -219,7 +359,7 @@ def get_shared_style(fg_color):
         h1 { display: flex; align-items: baseline; gap: 12px; }
         
         .date-subtitle { margin-top: 6px; font-size: 0.95em; opacity: 0.8; margin-bottom: 12px; }
-        .fg-box { padding: 10px; margin-bottom: 20px; border-radius: 5px; display: inline-block; font-weight: bold; font-size: 1.1em; background-color: REPLACEMENT_FG_COLOR; color: var(--fg-box-text); }
+        .fg-box { padding: 10px; margin-bottom: 20px; border-radius: 5px; display: inline-block; font-weight: bold; font-size: 1.1em; color: var(--fg-box-text); }
         
         /* Tables */
         .summary-table { border-collapse: collapse; margin: 20px 0; width: 100%; }
@@ -269,8 +409,9 @@ def get_shared_style(fg_color):
             .column { margin: 0 10px; }
             .summary-table { width: 60%; }
         }
-    </style>
-    <script>
+"""
+
+SHARED_JS = """
     document.addEventListener("DOMContentLoaded", function() {
         // Dark Mode Logic
         const toggle = document.getElementById('theme-toggle');
@@ -288,6 +429,7 @@ def get_shared_style(fg_color):
         });
 
         // Sorting Logic
+        const NUM_RE = /[^0-9.-]/g; // Compiled once; String.replace resets lastIndex for global regexes
         document.querySelectorAll("table.sortable").forEach(table => {
             const headers = table.querySelectorAll("th");
             headers.forEach((header, i) => {
@@ -307,46 +449,78 @@ def get_shared_style(fg_color):
                     }
                     const asc = !wasAsc;
 
+                    // Work out each cell's sort key once and keep it on the row for later clicks.
+                    // Numeric cells carry their value in data-sort; others fall back to parsing the text.
+                    const key = r => {
+                        r._sortKeys = r._sortKeys || [];
+                        if (!r._sortKeys[i]) {
+                            const c = r.cells[i], t = c.innerText.trim();
+                            const n = c.dataset.sort !== undefined ? parseFloat(c.dataset.sort) : parseFloat(t.replace(NUM_RE, ""));
+                            r._sortKeys[i] = { t: t, n: n };
+                        }
+                        return r._sortKeys[i];
+                    };
                     rows.sort((a, b) => {
-                        const aT = a.cells[i].innerText.trim(), bT = b.cells[i].innerText.trim();
-                        const aN = parseFloat(aT.replace(/[^0-9.-]/g, "")), bN = parseFloat(bT.replace(/[^0-9.-]/g, ""));
-                        return !isNaN(aN) && !isNaN(bN) ? (asc ? aN - bN : bN - aN) : (asc ? aT.localeCompare(bT) : bT.localeCompare(aT));
+                        const aK = key(a), bK = key(b);
+                        return !isNaN(aK.n) && !isNaN(bK.n) ? (asc ? aK.n - bK.n : bK.n - aK.n) : (asc ? aK.t.localeCompare(bK.t) : bK.t.localeCompare(aK.t));
                     });
-                    rows.forEach(r => tbody.appendChild(r));
+                    // Re-insert through one fragment: a single reflow instead of one per row
+                    const frag = document.createDocumentFragment();
+                    rows.forEach(r => frag.appendChild(r));
+                    tbody.appendChild(frag);
                 });
             });
         });
     });
-    </script>
-    """
-    return css.replace("REPLACEMENT_FG_COLOR", fg_color)
+"""
+
+def minify_css(css):
+    # Drop comments and indentation, then the spaces around punctuation (string contents here never rely on them)
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s*([{};,])\s*", r"\1", re.sub(r"\s+", " ", css))
+    return re.sub(r":\s+", ":", css).replace(";}", "}").strip()
+
+def minify_js(js):
+    # Line-based only: strip indentation, blank lines and whole-line comments, keep statements as written
+    lines = (l.strip() for l in js.splitlines())
+    return "\n".join(l for l in lines if l and not l.startswith("//"))
+
+def write_static_assets():
+    # Shared by both pages, so they live in their own files and the browser caches them across pages
+    for path, body in [("docs/styles.css", minify_css(SHARED_CSS)), ("docs/sort.js", minify_js(SHARED_JS))]:
+        with open(path, "w", encoding="utf-8") as f: f.write(body)
+
+# Cell background, weight and display text (words stripped for clean display) for the four scanner signals
+SIG_STYLE = {
+    "DM9 Top": ("#ffb3b3", "normal", "DM9"), "DM13 Top": ("#ffb3b3", "bold", "DM13"),
+    "DM9 Bot": ("#d4edda", "normal", "DM9"), "DM13 Bot": ("#d4edda", "bold", "DM13"),
+}
 
 def gen_table(signals):
     if not signals: return "<p>No signals.</p>"
     # Added "sortable" class to make sure JS targets it
-    h = "<table class='sortable'><thead><tr><th>Ticker</th><th>Price</th><th>Signal</th><th>Industry</th></tr></thead><tbody>"
+    h = ["<table class='sortable'><thead><tr><th>Ticker</th><th>Price</th><th>Signal</th><th>Industry</th></tr></thead><tbody>"]
     for t, p, s, ind in signals:
-        bg = "#ffb3b3" if "Top" in s else "#d4edda"
-        # Strip words for clean display
-        display_s = s.replace(" Top", "").replace(" Bot", "")
+        bg, weight, display_s = SIG_STYLE[s]
         # Dark mode overrides for specific cells can be tricky, 
         # so we use a span with slight transparency for background colors in dark mode? 
         # For now, keeping hardcoded colors as requested, but text color handles contrast.
         link = f"<a href='https://www.tradingview.com/chart/?symbol={t}' target='_blank' style='text-decoration:none; color:var(--link-color); font-weight:bold;'>{t}</a>"
         # We apply text-color black for these specific colored cells to ensure readability even in dark mode
-        h += f"<tr><td>{link}</td><td>{p:.2f}</td><td style='background-color:{bg}; color:#000; font-weight:{'bold' if '13' in s else 'normal'}'>{display_s}</td><td>{ind}</td></tr>"
-    return h + "</tbody></table>"
+        # data-sort carries the raw number so the JS sorter doesn't have to parse the cell text
+        h.append(f"<tr><td>{link}</td><td data-sort='{p:.4f}'>{p:.2f}</td><td style='background-color:{bg}; color:#000; font-weight:{weight}'>{display_s}</td><td>{ind}</td></tr>")
+    h.append("</tbody></table>")
+    return "".join(h)
 
 def gen_sec_table(title, counts):
     if not counts: return ""
-    h = f"<h3>{title}</h3><table><tr><th>Sector</th><th>Count</th></tr>"
-    for s, c in sorted(counts.items(), key=lambda x: x[1], reverse=True): h += f"<tr><td>{s}</td><td>{c}</td></tr>"
-    return h + "</table>"
+    rows = "".join(f"<tr><td>{s}</td><td>{c}</td></tr>" for s, c in sorted(counts.items(), key=lambda x: x[1], reverse=True))
+    return f"<h3>{title}</h3><table><tr><th>Sector</th><th>Count</th></tr>{rows}</table>"
 
-def write_reports(daily, weekly, d_sec, w_sec, fg, wyckoff, date_str):
+def write_reports(daily, weekly, d_sec, w_sec, fg, fg_chart, wyckoff, date_str):
     f_val, f_prev, f_date = fg
     f_col = "#dc3545" if isinstance(f_val, int) and f_val >= 60 else "#ffc107" if isinstance(f_val, int) and f_val >= 45 else "#28a745"
-    style = get_shared_style(f_col)
+    style = '<link rel="stylesheet" href="styles.css"><script defer src="sort.js"></script>'
     meta = '<meta charset="UTF-8"><meta name="viewport" content="width=device-width, initial-scale=1.0">'
     updated_at = f'<div class="update-footer">Last updated: {datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC")}</div>'
     
@@ -354,14 +528,17 @@ def write_reports(daily, weekly, d_sec, w_sec, fg, wyckoff, date_str):
     toggle = '<div id="theme-toggle" class="theme-toggle">🌙</div>'
     
     # --- INDEX HTML ---
+    # Pages are streamed to the file piece by piece instead of being built as one big string
     # Transposed Summary Table: Rows=Time, Cols=Signal
-    html_i = f"""<html><head>{meta}<title>Dashboard</title>{style}</head><body>
+    with open("docs/index.html", "w", encoding="utf-8") as f:
+        w = f.write
+        w(f"""<html><head>{meta}<title>Dashboard</title>{style}</head><body>
     {toggle}
     <div class="nav-bar"><a href="index.html" class="nav-link active-link">DeMark</a><a href="wyckoff.html" class="nav-link">Wyckoff</a></div>
     <h1>📈 US DM Dashboard 📉</h1><div class="date-subtitle">{date_str}</div>
     
-    <div class="fg-box">CNN Fear & Greed: {f_val} (Prev: {f_prev}) on {f_date}</div>
-    <img src="fg_trend.png" class="fg-chart" style="max-width: 480px; display:block; margin:6px 0 16px 0;">
+    <div class="fg-box" style="background-color:{f_col}">CNN Fear & Greed: {f_val} (Prev: {f_prev}) on {f_date}</div>
+    {fg_chart}
     
     <h2>Signal Summary</h2>
     <table class="summary-table">
@@ -369,50 +546,61 @@ def write_reports(daily, weekly, d_sec, w_sec, fg, wyckoff, date_str):
         <tr><td><strong>Daily</strong></td><td>{len(daily["Bottoms"])}</td><td>{len(daily["Tops"])}</td></tr>
         <tr><td><strong>Weekly</strong></td><td>{len(weekly["Bottoms"])}</td><td>{len(weekly["Tops"])}</td></tr>
     </table>
-    
-    <div class="row">
-        <div class="column"><h3>Daily Bottoms</h3>{gen_table(daily["Bottoms"])}{gen_sec_table("Daily Bottoms by Sector", d_sec["Bottoms"])}</div>
-        <div class="column"><h3>Daily Tops</h3>{gen_table(daily["Tops"])}{gen_sec_table("Daily Tops by Sector", d_sec["Tops"])}</div>
-    </div>
-    <div class="row">
-        <div class="column"><h3>Weekly Bottoms</h3>{gen_table(weekly["Bottoms"])}{gen_sec_table("Weekly Bottoms by Sector", w_sec["Bottoms"])}</div>
-        <div class="column"><h3>Weekly Tops</h3>{gen_table(weekly["Tops"])}{gen_sec_table("Weekly Tops by Sector", w_sec["Tops"])}</div>
-    </div>
-    {updated_at}</body></html>"""
-    with open("docs/index.html", "w", encoding="utf-8") as f: f.write(html_i)
+    """)
+        # One row of Bottoms/Tops columns per timeframe
+        for label, res, sec in [("Daily", daily, d_sec), ("Weekly", weekly, w_sec)]:
+            w('\n    <div class="row">')
+            for side in ["Bottoms", "Tops"]:
+                w(f'\n        <div class="column"><h3>{label} {side}</h3>')
+                w(gen_table(res[side])); w(gen_sec_table(f"{label} {side} by Sector", sec[side])); w('</div>')
+            w('\n    </div>')
+        w(f"\n    {updated_at}</body></html>")
 
     # --- WYCKOFF HTML ---
-    w_rows = ""
-    for t, p, sec, ind, pct in wyckoff:
-        lk = f"<a href='https://www.tradingview.com/chart/?symbol={t}' target='_blank' style='text-decoration:none; color:var(--link-color); font-weight:bold;'>{t}</a>"
-        w_rows += f"<tr><td>{lk}</td><td>{p:.2f}</td><td style='color:{'green' if pct>0 else 'red'}'>{pct:+.2f}%</td><td>{ind}</td><td style='background-color:#d4edda; color:#000;'>SOS</td></tr>"
-    
-    html_w = f"""<html><head>{meta}<title>Wyckoff</title>{style}</head><body>
+    with open("docs/wyckoff.html", "w", encoding="utf-8") as f:
+        w = f.write
+        w(f"""<html><head>{meta}<title>Wyckoff</title>{style}</head><body>
     {toggle}
     <div class="nav-bar"><a href="index.html" class="nav-link">DeMark</a><a href="wyckoff.html" class="nav-link active-link">Wyckoff</a></div>
     <h1>💪 Wyckoff SOS</h1><div class="date-subtitle">{date_str}</div>
-    <table class="sortable"><thead><tr><th>Ticker</th><th>Price</th><th>%</th><th>Industry</th><th>Pattern</th></tr></thead><tbody>{w_rows if w_rows else "<tr><td colspan='5'>None</td></tr>"}</tbody></table>
-    {updated_at}</body></html>"""
-    with open("docs/wyckoff.html", "w", encoding="utf-8") as f: f.write(html_w)
+    <table class="sortable"><thead><tr><th>Ticker</th><th>Price</th><th>%</th><th>Industry</th><th>Pattern</th></tr></thead><tbody>""")
+        for t, p, sec, ind, pct in wyckoff:
+            lk = f"<a href='https://www.tradingview.com/chart/?symbol={t}' target='_blank' style='text-decoration:none; color:var(--link-color); font-weight:bold;'>{t}</a>"
+            w(f"<tr><td>{lk}</td><td data-sort='{p:.4f}'>{p:.2f}</td><td data-sort='{pct:.4f}' style='color:{'green' if pct>0 else 'red'}'>{pct:+.2f}%</td><td>{ind}</td><td style='background-color:#d4edda; color:#000;'>SOS</td></tr>")
+        if not wyckoff: w("<tr><td colspan='5'>None</td></tr>")
+        w(f"</tbody></table>\n    {updated_at}</body></html>")
+
+def report_is_current():
+    # Weekend runs read the price caches unchanged, so a report written after their last refresh is already up to date
+    caches = glob.glob(os.path.join("cache", "price_cache_*.feather"))
+    report = os.path.join("docs", "index.html")
+    if datetime.utcnow().weekday() < 5 or not caches or not os.path.exists(report): return False
+    return os.path.getmtime(report) > max(os.path.getmtime(f) for f in caches)
 
 def main():
-    maps, inds = {}, {}
-    for f in ["sp_cache.csv", "russell_cache.csv", "nasdaq_cache.csv", "NDQ_cache.csv", "AMEX_cache.csv", "NYSE_cache.csv"]:
-        m, i = fetch_tickers_and_sectors_from_csv(f); maps.update(m); inds.update(i)
+    # Weekend re-run over an unchanged cache: the published pages are already current
+    if report_is_current(): return
+    maps, inds = load_ticker_maps(["sp_cache.csv", "russell_cache.csv", "nasdaq_cache.csv", "NDQ_cache.csv", "AMEX_cache.csv", "NYSE_cache.csv"])
     
-    # Run Scans
-    daily, d_s, d_date = scan_timeframe(maps, inds, "1D", "1d")
-    weekly, w_s, _ = scan_timeframe(maps, inds, "1W", "1wk")
-    wyckoff = scan_wyckoff(maps, inds)
+    # Run Scans (weekly and Wyckoff reuse the in-memory daily bars)
+    prices = load_or_fetch_price_data(list(maps.keys()), "1d", "6mo", "1D")
+    daily, d_s, d_date = scan_timeframe(maps, inds, prices, "1d")
+    weekly, w_s, _ = scan_timeframe(maps, inds, prices, "1wk")
+    wyckoff = scan_wyckoff(maps, inds, prices)
     fg = get_fear_and_greed()
     
-    # Generate Graph
-    plot_fear_greed_history()
+    # Generate Graph (inlined into index.html)
+    fg_chart = fear_greed_svg()
     
-    try:
-        ds = f"Signals triggered on {datetime.strptime(d_date, '%Y-%m-%d').strftime('%A, %b %d, %Y')} (as of NY close)"
-    except: ds = f"Signals triggered on {d_date} (as of NY close)"
+    # d_date is either a candle date from scan_timeframe or "N/A" when there was no data
+    if d_date != "N/A": d_date = datetime.strptime(d_date, '%Y-%m-%d').strftime('%A, %b %d, %Y')
+    ds = f"Signals triggered on {d_date} (as of NY close)"
     
-    write_reports(daily, weekly, d_s, w_s, fg, wyckoff, ds)
+    write_static_assets()
+    write_reports(daily, weekly, d_s, w_s, fg, fg_chart, wyckoff, ds)
+    # TEMPORARY migration: the chart is inlined as SVG now. Drop the PNG the previously published
+    # index.html used, in the same run that replaces that page. Delete these lines once
+    # docs/fg_trend.png is gone from the repo (i.e. after the first scheduled run).
+    if os.path.exists("docs/fg_trend.png"): os.remove("docs/fg_trend.png")
 
 if __name__ == "__main__": main()